@@ -0,0 +1,313 @@
+import hashlib
+import re
+
+# Article / section / chapter headings at the start of a line. The number must
+# be followed by a title separator or end of line, so line-wrapped cross
+# references ("...as set out in\nArticle 7 above.") are not headings.
+SECTION_HEADING_RE = re.compile(
+    r'^[ \t]*(article|art\.|section|sec\.|chapter|§)[ \t]*([0-9]+(?:\.[0-9]+)*[a-z]?|[ivxlc]+)'
+    r'(?=[ \t]*(?:[:.\-–—)]|$))',
+    re.IGNORECASE | re.MULTILINE
+)
+
+HEADING_KINDS = {
+    'article': 'Article', 'art.': 'Article',
+    'section': 'Section', 'sec.': 'Section', '§': 'Section',
+    'chapter': 'Chapter'
+}
+
+
+def _compact(text):
+    """Lowercase and drop all whitespace (also handles letter-spaced PDF text)"""
+    return re.sub(r'\s+', '', text.lower())
+
+
+def _section_hash(text):
+    return hashlib.md5(_compact(text).encode()).hexdigest()[:16]
+
+
+def split_into_sections(regulation_text):
+    """
+    Split a regulation into article/section level chunks
+
+    Returns:
+        List of dicts with 'key' (e.g. "Article 7"), 'text' and 'hash'.
+        Text before the first heading becomes the "Preamble" section.
+        Without any headings, paragraphs (blank-line separated) are used.
+        The hash covers the section without its heading label, so a
+        renumbered article keeps its hash.
+    """
+    matches = list(SECTION_HEADING_RE.finditer(regulation_text))
+
+    sections = []
+    if matches:
+        preamble = regulation_text[:matches[0].start()].strip()
+        if preamble:
+            sections.append({"key": "Preamble", "text": preamble, "body": preamble})
+
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(regulation_text)
+            kind = HEADING_KINDS[match.group(1).lower()]
+            sections.append({
+                "key": f"{kind} {match.group(2)}",
+                "text": regulation_text[match.start():end].strip(),
+                "body": regulation_text[match.end():end].strip()
+            })
+    else:
+        paragraphs = [p.strip() for p in re.split(r'\n\s*\n', regulation_text) if p.strip()]
+        for i, paragraph in enumerate(paragraphs, 1):
+            sections.append({"key": f"Paragraph {i}", "text": paragraph, "body": paragraph})
+
+    # Repeated headings (e.g. sub-articles) get a suffix so keys stay unique
+    seen = {}
+    for section in sections:
+        count = seen.get(section['key'], 0)
+        seen[section['key']] = count + 1
+        if count:
+            section['key'] = f"{section['key']} ({count + 1})"
+        section['hash'] = _section_hash(section.pop('body'))
+
+    return sections
+
+
+def diff_sections(old_sections, new_sections):
+    """
+    Compare two section lists
+
+    Returns:
+        (statuses, removed) where statuses is a list of
+        (new_section, status, matched_old_key) with status in
+        'unchanged' | 'changed' | 'added', and removed lists old section keys
+        with no counterpart in the new text.
+    """
+    old_by_key = {s['key']: s for s in old_sections}
+    old_by_hash = {}
+    for s in old_sections:
+        old_by_hash.setdefault(s['hash'], []).append(s['key'])
+
+    # Content first, so an inserted article or paragraph doesn't turn every
+    # following (renumbered) section into 'changed'. Same-key matches go
+    # first so repeated identical sections pair up in order.
+    unchanged = {}  # new section key -> old section key
+    for section in new_sections:
+        old = old_by_key.get(section['key'])
+        if old is not None and old['hash'] == section['hash']:
+            unchanged[section['key']] = old['key']
+    matched_old = set(unchanged.values())
+    for section in new_sections:
+        if section['key'] in unchanged:
+            continue
+        for old_key in old_by_hash.get(section['hash'], []):
+            if old_key not in matched_old:
+                unchanged[section['key']] = old_key
+                matched_old.add(old_key)
+                break
+
+    # Remaining sections pair with an unmatched old section of the same key
+    statuses = []
+    for section in new_sections:
+        old = old_by_key.get(section['key'])
+        if section['key'] in unchanged:
+            statuses.append((section, 'unchanged', unchanged[section['key']]))
+        elif old is not None and old['key'] not in matched_old:
+            statuses.append((section, 'changed', old['key']))
+            matched_old.add(old['key'])
+        else:
+            statuses.append((section, 'added', None))
+
+    removed = [s['key'] for s in old_sections if s['key'] not in matched_old]
+    return statuses, removed
+
+
+def assign_verdict_section(verdict, old_sections):
+    """
+    Find which old section a stored verdict belongs to
+
+    Verdicts produced in amendment mode carry a 'section' key; for full
+    analyses the quoted new_rule_excerpt is located in the old text, falling
+    back to the section with the largest word overlap.
+    """
+    keys = {s['key'] for s in old_sections}
+    if verdict.get('section') in keys:
+        return verdict['section']
+
+    quote = _compact(verdict.get('new_rule_excerpt', ''))
+    if quote:
+        for section in old_sections:
+            if quote in _compact(section['text']):
+                return section['key']
+
+    quote_words = set(re.findall(r'\w+', verdict.get('new_rule_excerpt', '').lower()))
+    best_key, best_overlap = None, 0
+    for section in old_sections:
+        overlap = len(quote_words & set(re.findall(r'\w+', section['text'].lower())))
+        if overlap > best_overlap:
+            best_key, best_overlap = section['key'], overlap
+    return best_key
+
+
+class AmendmentAnalyzerAgent:
+    """
+    Amendment mode: re-analyzes only the articles/sections of a regulation
+    that changed since a previous analysis, reusing stored verdicts for the rest
+    """
+
+    def __init__(self, researcher, auditor, report_generator, section_top_k=3, full_top_k=5,
+                 full_fallback_ratio=0.5):
+        self.researcher = researcher
+        self.auditor = auditor
+        self.report_generator = report_generator
+        # Excerpts audited per changed section, and for a full analysis
+        self.section_top_k = section_top_k
+        self.full_top_k = full_top_k
+        # Share of the regulation text that must change before it is fully re-analyzed
+        self.full_fallback_ratio = full_fallback_ratio
+        print("✅ Amendment Analyzer Agent initialized")
+
+    def analyze_amendment(self, previous_regulation_id, new_regulation_text, date_of_law=None):
+        """
+        Main method: Produce a merged report for an amended regulation
+
+        Args:
+            previous_regulation_id: regulation_id of the earlier analyzed version
+            new_regulation_text: Full text of the amended regulation
+            date_of_law: Optional date string (YYYY-MM-DD)
+
+        Returns:
+            Complete JSON report with an 'amendment' summary; each risk is
+            tagged with its 'section' and 'change_status'
+
+        Raises:
+            FileNotFoundError: if the previous regulation has no stored record
+        """
+        print("\n" + "="*60)
+        print("📝 AMENDMENT ANALYZER AGENT - Starting Incremental Analysis")
+        print("="*60)
+
+        previous = self.report_generator.load_regulation_record(previous_regulation_id)
+        old_sections = split_into_sections(previous['regulation_text'])
+        new_sections = split_into_sections(new_regulation_text)
+        statuses, removed = diff_sections(old_sections, new_sections)
+
+        # Group stored verdicts by the old section they refer to
+        verdicts_by_section = {}
+        for verdict in previous['audit_results']:
+            key = assign_verdict_section(verdict, old_sections)
+            verdicts_by_section.setdefault(key, []).append(verdict)
+
+        # Fallback verdicts (quota/parse/API errors) carry no real judgement,
+        # so their sections are re-audited as if changed
+        statuses = [
+            (section, 'changed', old_key)
+            if status == 'unchanged' and any(v.get('error_type') for v in verdicts_by_section.get(old_key, []))
+            else (section, status, old_key)
+            for section, status, old_key in statuses
+        ]
+
+        status_by_key = {section['key']: status for section, status, _ in statuses}
+        pending = [section for section, status, _ in statuses if status != 'unchanged']
+
+        # Changed/added sections are audited together in one pass, always with
+        # fewer excerpts than a full analysis; only when they make up most of
+        # the regulation is the full analysis re-run instead
+        pending_chars = sum(len(_compact(section['text'])) for section in pending)
+        full_fallback = bool(pending) and (
+            pending_chars > self.full_fallback_ratio * len(_compact(new_regulation_text))
+        )
+        if full_fallback:
+            top_k = self.full_top_k
+        else:
+            top_k = max(1, min(self.section_top_k * len(pending), self.full_top_k - 1))
+
+        merged = []
+        reused = 0
+        new_llm_calls = 0
+        if full_fallback:
+            print(f"\n🔄 Most of the regulation changed ({len(pending)} sections) - re-running the full analysis")
+            audit_text, attribution_sections = new_regulation_text, new_sections
+        else:
+            for section, status, old_key in statuses:
+                if status == 'unchanged':
+                    for verdict in verdicts_by_section.get(old_key, []):
+                        merged.append(dict(verdict, section=section['key'], change_status='unchanged'))
+                        reused += 1
+            if pending:
+                print(f"\n🔄 Re-auditing changed sections: {', '.join(s['key'] for s in pending)}")
+            audit_text = "\n\n".join(section['text'] for section in pending)
+            attribution_sections = pending
+
+        if pending:
+            policy_results = self.researcher.vector_db_search(audit_text, top_k=top_k)
+            audit_results = self.auditor.analyze(policy_results, audit_text)
+            new_llm_calls += len(policy_results)
+            for verdict in audit_results:
+                key = assign_verdict_section(verdict, attribution_sections) or attribution_sections[0]['key']
+                merged.append(dict(verdict, section=key, change_status=status_by_key[key]))
+
+        # Same ordering as a full analysis, with fresh sequential policy IDs
+        severity_order = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
+        merged.sort(key=lambda x: severity_order.get(x['severity'], 3))
+        for i, verdict in enumerate(merged, 1):
+            verdict['policy_id'] = f"POL-{str(i).zfill(3)}"
+
+        report = self.report_generator.build_report(merged, new_regulation_text, date_of_law)
+        report["amendment"] = {
+            "previous_regulation_id": previous_regulation_id,
+            "mode": "full" if full_fallback else "incremental",
+            "sections_unchanged": [s['key'] for s, status, _ in statuses if status == 'unchanged'],
+            "sections_changed": [s['key'] for s, status, _ in statuses if status == 'changed'],
+            "sections_added": [s['key'] for s, status, _ in statuses if status == 'added'],
+            "sections_removed": removed,
+            "reused_verdicts": reused,
+            "new_llm_calls": new_llm_calls
+        }
+        filepath = self.report_generator.save_report(report, new_regulation_text, merged)
+
+        amendment = report["amendment"]
+        print(f"\n✅ Amendment report generated")
+        print(f"   Previous ID: {previous_regulation_id} → New ID: {report['regulation_id']}")
+        print(f"   Unchanged: {len(amendment['sections_unchanged'])}, "
+              f"Changed: {len(amendment['sections_changed'])}, "
+              f"Added: {len(amendment['sections_added'])}, "
+              f"Removed: {len(amendment['sections_removed'])}")
+        print(f"   Reused verdicts: {reused}, New Gemini calls: {new_llm_calls}")
+        print(f"   Saved to: {filepath}")
+
+        return report
+
+
+# Test: analyze a regulation, then an amended version of it
+if __name__ == "__main__":
+    import json
+    from agent_policy_researcher import PolicyResearcherAgent
+    from agent_compliance_auditor import ComplianceAuditorAgent
+    from agent_report_generator import ReportGeneratorAgent
+
+    agent1 = PolicyResearcherAgent()
+    agent2 = ComplianceAuditorAgent()
+    agent3 = ReportGeneratorAgent()
+    amendment_agent = AmendmentAnalyzerAgent(agent1, agent2, agent3)
+
+    original_regulation = """
+    Article 7: Data Retention Requirements
+    Personal data must be permanently deleted after 12 months of user inactivity.
+
+    Article 8: Consent
+    Companies must obtain explicit written consent before processing any personal information.
+    """
+    amended_regulation = """
+    Article 7: Data Retention Requirements
+    Personal data must be permanently deleted after 6 months of user inactivity.
+
+    Article 8: Consent
+    Companies must obtain explicit written consent before processing any personal information.
+    """
+
+    policy_results = agent1.analyze(original_regulation)
+    audit_results = agent2.analyze(policy_results, original_regulation)
+    original_report = agent3.generate_report(audit_results, original_regulation, "2025-12-06")
+
+    amended_report = amendment_agent.analyze_amendment(
+        original_report['regulation_id'], amended_regulation, "2025-12-06"
+    )
+    print(json.dumps(amended_report, indent=2))
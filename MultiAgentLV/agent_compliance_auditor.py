@@ -44,6 +44,7 @@ class ComplianceAuditorAgent:
         
         Returns:
             dict with severity, summary, excerpts, and recommendation
+            (fallback results also carry an 'error_type' key)
         """
         
         prompt = f"""You are a legal compliance expert. Analyze if there is a conflict between the company's internal policy and the new regulation.
@@ -128,7 +129,8 @@ Respond ONLY with a valid JSON object in this exact format (no markdown, no extr
                         "divergence_summary": "Analysis failed - manual review required",
                         "conflicting_policy_excerpt": policy_excerpt[:200],
                         "new_rule_excerpt": new_regulation_text[:200],
-                        "recommendation": "Manual legal review required due to parsing error"
+                        "recommendation": "Manual legal review required due to parsing error",
+                        "error_type": "parse_error"
                     }
             
             except Exception as e:
@@ -149,7 +151,8 @@ Respond ONLY with a valid JSON object in this exact format (no markdown, no extr
                             "divergence_summary": "API quota exceeded - analysis incomplete",
                             "conflicting_policy_excerpt": policy_excerpt[:200],
                             "new_rule_excerpt": new_regulation_text[:200],
-                            "recommendation": "Retry analysis after quota reset or upgrade API plan"
+                            "recommendation": "Retry analysis after quota reset or upgrade API plan",
+                            "error_type": "quota_exceeded"
                         }
                 
                 # Other errors
@@ -164,7 +167,8 @@ Respond ONLY with a valid JSON object in this exact format (no markdown, no extr
                         "divergence_summary": f"Analysis error: {error_str[:100]}",
                         "conflicting_policy_excerpt": policy_excerpt[:200],
                         "new_rule_excerpt": new_regulation_text[:200],
-                        "recommendation": "Technical error - retry analysis"
+                        "recommendation": "Technical error - retry analysis",
+                        "error_type": "api_error"
                     }
         
         return None
@@ -201,6 +205,7 @@ Respond ONLY with a valid JSON object in this exact format (no markdown, no extr
                 # Add source metadata
                 analysis['source'] = policy['source']
                 analysis['page'] = policy['page']
+                analysis['policy_excerpt'] = policy['excerpt']
                 analyses.append(analysis)
                 
                 print(f"    ✅ Severity: {analysis['severity']}")
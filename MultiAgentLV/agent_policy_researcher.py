@@ -1,6 +1,16 @@
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from bm25_index import BM25Index, BM25CorpusStats
+
+# Hybrid retrieval: candidates pulled from each ranking per requested result,
+# and the Reciprocal Rank Fusion constant
+CANDIDATE_MULTIPLIER = 4
+RRF_K = 60
 
 # Singleton pattern for embedding model (consistent across requests)
 _embedding_model_instance = None
@@ -17,67 +27,272 @@ def get_embedding_model():
     return _embedding_model_instance
 
 
+def normalize_policy_filter(policy_filter):
+    """
+    Normalize a retrieval filter to {"domain": [...], "tenant": [...]}
+    
+    Accepts None, a list of domains, or a dict with 'domain' and/or 'tenant'
+    (each a string or list). Returns None when nothing is filtered.
+    """
+    if not policy_filter:
+        return None
+    if isinstance(policy_filter, (list, tuple, set)):
+        policy_filter = {"domain": list(policy_filter)}
+    
+    normalized = {}
+    for field in ("domain", "tenant"):
+        values = policy_filter.get(field)
+        if values:
+            if isinstance(values, str):
+                values = [values]
+            normalized[field] = sorted({v.strip() for v in values if v.strip()})
+    return normalized or None
+
+
+class UnknownPolicyDomainError(ValueError):
+    """A retrieval filter names a policy domain or tenant with no shard"""
+
+
+class ShardCache:
+    """
+    Memory-bounded LRU of open FAISS shards
+    
+    Shards load lazily on first use; when the estimated resident size
+    (on-disk size of each shard) exceeds the budget, the least recently
+    used shards are closed. The most recent shard is always kept.
+    """
+    
+    def __init__(self, base_path, manifest, max_bytes, corpus_stats=None):
+        self.base_path = base_path
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self.corpus_stats = corpus_stats  # BM25 statistics shared by all shards
+        self._open = OrderedDict()  # shard_id -> (vector_store, bm25, size_bytes)
+        self._lock = threading.Lock()
+    
+    def _shard_size(self, shard_path):
+        return sum(
+            os.path.getsize(os.path.join(shard_path, name))
+            for name in os.listdir(shard_path)
+            if os.path.isfile(os.path.join(shard_path, name))
+        )
+    
+    def get(self, shard_id):
+        with self._lock:
+            if shard_id in self._open:
+                self._open.move_to_end(shard_id)
+                return self._open[shard_id][:2]
+            
+            shard_path = os.path.join(self.base_path, self.manifest[shard_id]['path'])
+            vector_store = FAISS.load_local(
+                shard_path,
+                get_embedding_model(),
+                allow_dangerous_deserialization=True
+            )
+            bm25 = BM25Index.load(shard_path)
+            if bm25 is not None and self.corpus_stats is not None:
+                bm25.use_corpus_stats(self.corpus_stats)
+            self._open[shard_id] = (vector_store, bm25, self._shard_size(shard_path))
+            
+            # Evict least recently used shards over the memory budget
+            while len(self._open) > 1 and self.resident_bytes() > self.max_bytes:
+                evicted_id, _ = self._open.popitem(last=False)
+                print(f"♻️  Closed shard {evicted_id} (memory budget)")
+            
+            return vector_store, bm25
+    
+    def resident_bytes(self):
+        return sum(size for _, _, size in self._open.values())
+
+
 class PolicyResearcherAgent:
     """
     Agent 1: Policy Researcher - Searches for relevant policy excerpts
     with deterministic embeddings and consistent results
     """
     
-    def __init__(self, faiss_index_path="faiss_index"):
-        # Load FAISS index
-        print("📥 Loading FAISS index...")
+    def __init__(self, faiss_index_path="faiss_index", max_shard_memory_mb=256):
+        # Read the shard manifest - shards themselves load lazily on first search
+        print("📥 Loading FAISS shard manifest...")
         
-        if not os.path.exists(faiss_index_path):
+        manifest_path = os.path.join(faiss_index_path, "shards", "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.shards = json.load(f)["shards"]
+            print(f"✅ Found {len(self.shards)} policy domain shards")
+        elif os.path.exists(os.path.join(faiss_index_path, "index.faiss")):
+            # Single index from an older rag_setup.py: served as one shard
+            self.shards = {
+                "legacy": {"tenant": None, "domain": None, "sources": [], "chunks": None, "path": "."}
+            }
+            print("⚠️  Legacy single FAISS index found - re-run rag_setup.py to enable policy domain filters")
+        else:
             raise FileNotFoundError(
                 f"FAISS index not found at '{faiss_index_path}'. "
                 "Please run rag_setup.py first."
             )
         
-        embeddings = get_embedding_model()
+        # Corpus-wide BM25 statistics keep lexical scores comparable across shards
+        corpus_stats = None
+        if "legacy" not in self.shards:
+            corpus_stats = BM25CorpusStats.load(faiss_index_path)
+            if corpus_stats is None:
+                print("⚠️  BM25 corpus statistics missing - computing them from the shards")
+                corpus_stats = BM25CorpusStats.from_indexes(
+                    index for index in (
+                        BM25Index.load(os.path.join(faiss_index_path, shard['path']))
+                        for shard in self.shards.values()
+                    ) if index is not None
+                )
         
-        self.vector_store = FAISS.load_local(
-            faiss_index_path, 
-            embeddings, 
-            allow_dangerous_deserialization=True
+        self.shard_cache = ShardCache(
+            faiss_index_path, self.shards, max_shard_memory_mb * 1024 * 1024, corpus_stats
         )
-        print("✅ FAISS index loaded successfully")
     
-    def vector_db_search(self, query, top_k=5):
+    def select_shards(self, policy_filter):
+        """
+        Return shard IDs matching a normalized filter (all shards for None)
+        
+        Raises:
+            UnknownPolicyDomainError: if a requested domain or tenant is not in the manifest
         """
-        Retrieve top K most relevant policy excerpts using semantic search
+        if policy_filter is None:
+            return sorted(self.shards)
+        
+        known = {
+            field: sorted({shard[field] for shard in self.shards.values() if shard[field]})
+            for field in ("domain", "tenant")
+        }
+        unknown = {
+            field: [value for value in policy_filter.get(field, []) if value not in known[field]]
+            for field in ("domain", "tenant")
+        }
+        if unknown["domain"] or unknown["tenant"]:
+            if "legacy" in self.shards:
+                raise UnknownPolicyDomainError(
+                    "Policy domain filters need the shard manifest - re-run rag_setup.py"
+                )
+            parts = [
+                f"unknown {field}(s) {', '.join(unknown[field])} "
+                f"(valid: {', '.join(known[field]) or 'none'})"
+                for field in ("domain", "tenant") if unknown[field]
+            ]
+            raise UnknownPolicyDomainError("Invalid policy filter: " + "; ".join(parts))
+        
+        selected = []
+        for shard_id, shard in sorted(self.shards.items()):
+            if "domain" in policy_filter and shard['domain'] not in policy_filter['domain']:
+                continue
+            if "tenant" in policy_filter and shard['tenant'] not in policy_filter['tenant']:
+                continue
+            selected.append(shard_id)
+        return selected
+    
+    @staticmethod
+    def _format_source(metadata):
+        """Extract clean source file name from chunk metadata"""
+        source_path = metadata.get('source', 'unknown')
+        return os.path.basename(source_path).replace('\\', '/')
+    
+    def iter_chunks(self):
+        """
+        Iterate over every policy chunk stored in the FAISS shards
+        
+        Shards are opened one at a time through the shard LRU.
+        
+        Yields:
+            Dicts with 'excerpt', 'source' and 'page' (same format as search results)
+        """
+        for shard_id in self.select_shards(None):
+            vector_store, _ = self.shard_cache.get(shard_id)
+            for doc in list(vector_store.docstore._dict.values()):
+                yield {
+                    "excerpt": doc.page_content,
+                    "source": self._format_source(doc.metadata),
+                    "page": doc.metadata.get('page', 'N/A')
+                }
+    
+    def vector_db_search(self, query, top_k=5, policy_filter=None):
+        """
+        Retrieve top K most relevant policy excerpts using hybrid search
+        
+        Dense (MiniLM) and lexical (BM25) rankings are combined with
+        Reciprocal Rank Fusion, so exact terms like "30 days" or article
+        numbers reach the top results.
         
         Args:
             query: The new regulation text to search against
             top_k: Number of results to return (default: 5)
+            policy_filter: Optional domains list or {"domain": ..., "tenant": ...};
+                only the matching shards are searched (all shards if None)
         
         Returns:
             List of dictionaries with policy excerpts and metadata (sorted by relevance)
         """
-        # Perform similarity search (deterministic with normalized embeddings)
-        results = self.vector_store.similarity_search_with_score(query, k=top_k)
+        policy_filter = normalize_policy_filter(policy_filter)
+        shard_ids = self.select_shards(policy_filter)
         
-        formatted_results = []
-        for i, (doc, score) in enumerate(results):
-            # Extract clean source path
-            source_path = doc.metadata.get('source', 'unknown')
-            source_file = os.path.basename(source_path).replace('\\', '/')
+        # Embed once (deterministic with normalized embeddings)
+        query_embedding = get_embedding_model().embed_query(query)
+        query_vector = np.array(query_embedding, dtype='float32')
+        candidate_k = top_k * CANDIDATE_MULTIPLIER
+        
+        # candidate key -> {doc, distance, lexical}
+        candidates = {}
+        vector_ranking = []
+        lexical_ranking = []
+        for store_id in shard_ids:
+            # Opened one at a time so the LRU memory budget holds during the search
+            vector_store, bm25 = self.shard_cache.get(store_id)
+            for doc, distance in vector_store.similarity_search_with_score_by_vector(query_embedding, k=candidate_k):
+                key = (store_id, doc.page_content, doc.metadata.get('source'), doc.metadata.get('page'))
+                candidates.setdefault(key, {"doc": doc, "distance": float(distance), "lexical": 0.0})
+                vector_ranking.append((float(distance), key))
             
+            if bm25 is None:
+                continue
+            for position, lexical_score in bm25.search(query, top_k=candidate_k):
+                doc = vector_store.docstore.search(bm25.doc_ids[position])
+                key = (store_id, doc.page_content, doc.metadata.get('source'), doc.metadata.get('page'))
+                if key not in candidates:
+                    # Same (squared L2) distance FAISS would have reported
+                    stored_vector = vector_store.index.reconstruct(position)
+                    distance = float(np.sum((stored_vector - query_vector) ** 2))
+                    candidates[key] = {"doc": doc, "distance": distance, "lexical": 0.0}
+                candidates[key]["lexical"] = lexical_score
+                lexical_ranking.append((-lexical_score, key))
+        
+        # Reciprocal Rank Fusion over the merged (cross-shard) rankings
+        fusion = {}
+        for ranking in (vector_ranking, lexical_ranking):
+            ranking.sort(key=lambda item: item[0])
+            for rank, (_, key) in enumerate(ranking[:candidate_k], 1):
+                fusion[key] = fusion.get(key, 0.0) + 1.0 / (RRF_K + rank)
+        
+        ranked = sorted(fusion, key=lambda key: (-fusion[key], candidates[key]["distance"]))[:top_k]
+        
+        formatted_results = []
+        for i, key in enumerate(ranked):
+            doc = candidates[key]["doc"]
             formatted_results.append({
                 "policy_id": f"POL-{str(i+1).zfill(3)}",  # POL-001, POL-002, etc.
                 "excerpt": doc.page_content,
-                "source": source_file,
+                "source": self._format_source(doc.metadata),
                 "page": doc.metadata.get('page', 'N/A'),
-                "similarity_score": round(float(score), 4)
+                "similarity_score": round(candidates[key]["distance"], 4),
+                "lexical_score": round(candidates[key]["lexical"], 4),
+                "fusion_score": round(fusion[key], 6)
             })
         
         return formatted_results
     
-    def analyze(self, new_regulation_text):
+    def analyze(self, new_regulation_text, policy_filter=None):
         """
         Main method: Search for relevant policies with consistent results
         
         Args:
             new_regulation_text: The text of the new regulation
+            policy_filter: Optional domain/tenant filter (see vector_db_search)
         
         Returns:
             List of top 5 relevant policy excerpts (consistent ordering by relevance)
@@ -89,8 +304,12 @@ class PolicyResearcherAgent:
         print(f"\n📋 New Regulation Preview:")
         print(f"{new_regulation_text[:200]}...\n")
         
-        print("🔎 Searching FAISS database for relevant policies...")
-        results = self.vector_db_search(new_regulation_text, top_k=5)
+        policy_filter = normalize_policy_filter(policy_filter)
+        if policy_filter:
+            print(f"🔎 Searching policy shards {policy_filter} for relevant policies...")
+        else:
+            print("🔎 Searching FAISS database for relevant policies...")
+        results = self.vector_db_search(new_regulation_text, top_k=5, policy_filter=policy_filter)
         
         print(f"\n✅ Found {len(results)} relevant policy excerpts:\n")
         for r in results:
@@ -2,6 +2,11 @@ import json
 import hashlib
 from datetime import datetime
 import os
+from policy_citation_index import PolicyCitationIndex
+
+# Optional per-risk fields copied into the report when the auditor/amendment
+# analyzer provides them
+OPTIONAL_RISK_FIELDS = ('section', 'change_status')
 
 
 class ReportGeneratorAgent:
@@ -12,8 +17,17 @@ class ReportGeneratorAgent:
     
     def __init__(self, output_folder="../output"):
         self.output_folder = output_folder
+        # Regulation text + full verdicts, kept so later runs can reuse them
+        self.records_folder = os.path.join(output_folder, "records")
         # Create output folder if it doesn't exist
         os.makedirs(self.output_folder, exist_ok=True)
+        os.makedirs(self.records_folder, exist_ok=True)
+        # Reverse index: policy chunk → reports/verdicts that cited it
+        self.citation_index = PolicyCitationIndex(
+            os.path.join(output_folder, "index", "policy_citations")
+        )
+        if not self.citation_index.exists():
+            self.citation_index.rebuild_from_records(self.records_folder)
         print("✅ Report Generator Agent initialized")
         print(f"📁 Output folder: {os.path.abspath(self.output_folder)}")
     
@@ -31,9 +45,9 @@ class ReportGeneratorAgent:
         reports.sort(reverse=True)  # Most recent first
         return reports
     
-    def generate_report(self, audit_results, new_regulation_text, date_of_law=None):
+    def build_report(self, audit_results, new_regulation_text, date_of_law=None):
         """
-        Main method: Generate final JSON report
+        Build the JSON report dict from audit results (without saving it)
         
         Args:
             audit_results: List of analysis dicts from Compliance Auditor
@@ -43,10 +57,6 @@ class ReportGeneratorAgent:
         Returns:
             Complete JSON report as dict
         """
-        print("\n" + "="*60)
-        print("📄 REPORT GENERATOR AGENT - Creating Final Report")
-        print("="*60)
-        
         # Generate regulation ID
         regulation_id = self.generate_regulation_id(new_regulation_text, date_of_law)
         
@@ -66,6 +76,9 @@ class ReportGeneratorAgent:
                 "new_rule_excerpt": result['new_rule_excerpt'],
                 "recommendation": result['recommendation']
             }
+            for field in OPTIONAL_RISK_FIELDS:
+                if field in result:
+                    risk[field] = result[field]
             risks.append(risk)
         
         # Generate overall recommendation
@@ -92,19 +105,98 @@ class ReportGeneratorAgent:
             "recommendation": overall_recommendation
         }
         
+        return report
+    
+    def save_report(self, report, new_regulation_text=None, audit_results=None, report_file=None):
+        """
+        Save a report dict to the output folder
+        
+        Args:
+            report: Report dict from build_report
+            new_regulation_text: Optional regulation text; when given together with
+                audit_results, a regulation record is saved alongside the report
+            audit_results: Optional full audit results behind the report
+            report_file: Optional existing report file name to overwrite
+        
+        Returns:
+            Path of the saved JSON file
+        """
         # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"compliance_report_{timestamp}_{regulation_id}.json"
+        if report_file:
+            filename = report_file
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"compliance_report_{timestamp}_{report['regulation_id']}.json"
         filepath = os.path.join(self.output_folder, filename)
         
-        # Save report
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(report, f, indent=2, ensure_ascii=False)
         
+        if new_regulation_text is not None and audit_results is not None:
+            self.save_regulation_record(report, new_regulation_text, audit_results, filename)
+        
+        return filepath
+    
+    def _record_path(self, regulation_id):
+        return os.path.join(self.records_folder, f"{regulation_id}.json")
+    
+    def save_regulation_record(self, report, new_regulation_text, audit_results, report_file):
+        """Store regulation text and per-excerpt verdicts for later reuse"""
+        record = {
+            "regulation_id": report['regulation_id'],
+            "date_of_law": report['date_of_law'],
+            "report_file": report_file,
+            "regulation_text": new_regulation_text,
+            "audit_results": audit_results
+        }
+        with open(self._record_path(report['regulation_id']), "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+        
+        self.citation_index.update_record(record)
+    
+    def load_regulation_record(self, regulation_id):
+        """
+        Load the stored record for a previously analyzed regulation
+        
+        Raises:
+            FileNotFoundError: if no record exists for regulation_id
+        """
+        record_path = self._record_path(regulation_id)
+        if not os.path.exists(record_path):
+            raise FileNotFoundError(
+                f"No stored record for regulation '{regulation_id}'. "
+                "Only regulations analyzed after records were introduced can be amended."
+            )
+        with open(record_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def generate_report(self, audit_results, new_regulation_text, date_of_law=None, return_path=False):
+        """
+        Main method: Generate final JSON report
+        
+        Args:
+            audit_results: List of analysis dicts from Compliance Auditor
+            new_regulation_text: The regulation text
+            date_of_law: Optional date string (YYYY-MM-DD)
+            return_path: Also return the saved report's file name
+        
+        Returns:
+            Complete JSON report as dict, or (report, report_file) if return_path
+        """
+        print("\n" + "="*60)
+        print("📄 REPORT GENERATOR AGENT - Creating Final Report")
+        print("="*60)
+        
+        report = self.build_report(audit_results, new_regulation_text, date_of_law)
+        
+        # Save report
+        filepath = self.save_report(report, new_regulation_text, audit_results)
+        
+        breakdown = report['risk_breakdown']
         print(f"\n✅ Report generated successfully")
-        print(f"   Regulation ID: {regulation_id}")
+        print(f"   Regulation ID: {report['regulation_id']}")
         print(f"   Total Risks: {len(audit_results)}")
-        print(f"   Breakdown: HIGH={high_count}, MEDIUM={medium_count}, LOW={low_count}")
+        print(f"   Breakdown: HIGH={breakdown['HIGH']}, MEDIUM={breakdown['MEDIUM']}, LOW={breakdown['LOW']}")
         print(f"   Saved to: {filepath}")
         
         # List all reports
@@ -115,6 +207,8 @@ class ReportGeneratorAgent:
             for i, report_file in enumerate(all_reports[:5], 1):
                 print(f"   {i}. {report_file}")
         
+        if return_path:
+            return report, os.path.basename(filepath)
         return report
 
 
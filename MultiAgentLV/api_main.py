@@ -1,11 +1,16 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form
 from pydantic import BaseModel, Field
-from typing import Optional
-from agent_policy_researcher import PolicyResearcherAgent
+from typing import Optional, List
+from agent_policy_researcher import PolicyResearcherAgent, UnknownPolicyDomainError, normalize_policy_filter
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from agent_compliance_auditor import ComplianceAuditorAgent
 from agent_report_generator import ReportGeneratorAgent
+from agent_amendment_analyzer import AmendmentAnalyzerAgent
+from single_flight import SingleFlight
+from semantic_cache import SemanticReportCache
 import uvicorn
+import os
 from pypdf import PdfReader
 import io
 
@@ -28,11 +33,29 @@ app.add_middleware(
 class RegulationRequest(BaseModel):
     new_regulation_text: str = Field(..., max_length=2000, description="The text of the new regulation (max 2000 words)")
     date_of_law: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$', description="Date in YYYY-MM-DD format")
+    policy_domains: Optional[List[str]] = Field(None, description="Only search these policy domains (see GET /policy_domains)")
+    tenant: Optional[str] = Field(None, description="Only search policies of this tenant / business unit")
+
+# Request model for amended regulations
+class AmendmentRequest(BaseModel):
+    previous_regulation_id: str = Field(..., pattern=r'^[0-9a-f]{16}$', description="regulation_id of the previously analyzed version")
+    new_regulation_text: str = Field(..., max_length=2000, description="The full text of the amended regulation")
+    date_of_law: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$', description="Date in YYYY-MM-DD format")
 
 # Initialize agents (load once at startup)
 agent1 = PolicyResearcherAgent()
 agent2 = ComplianceAuditorAgent()
 agent3 = ReportGeneratorAgent()
+amendment_agent = AmendmentAnalyzerAgent(agent1, agent2, agent3)
+
+# Coalesces identical in-flight analyses (keyed on regulation_id)
+analysis_flight = SingleFlight()
+
+# Returns past reports for near-identical regulations (set threshold > 1.0 to disable)
+semantic_cache = SemanticReportCache(
+    agent3,
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.97'))
+)
 
 def extract_text_from_pdf(pdf_file: bytes) -> str:
     """Extract text from uploaded PDF file"""
@@ -45,6 +68,66 @@ def extract_text_from_pdf(pdf_file: bytes) -> str:
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
 
+def build_policy_filter(policy_domains: Optional[List[str]], tenant: Optional[str]) -> Optional[dict]:
+    """Combine request fields into a normalized retrieval filter (400 on unknown domains/tenants)"""
+    policy_filter = normalize_policy_filter({"domain": policy_domains or [], "tenant": tenant or []})
+    try:
+        agent1.select_shards(policy_filter)
+    except UnknownPolicyDomainError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return policy_filter
+
+def run_analysis_pipeline(regulation_text: str, date_of_law: Optional[str] = None,
+                          policy_filter: Optional[dict] = None) -> dict:
+    """Run Agent 1 → Agent 2 → Agent 3 on a regulation (or reuse a cached near-duplicate)"""
+    cached_report = semantic_cache.lookup(regulation_text, scope=policy_filter, date_of_law=date_of_law)
+    if cached_report is not None:
+        return cached_report
+    
+    # Step 1: Find relevant policies
+    policy_results = agent1.analyze(regulation_text, policy_filter=policy_filter)
+    
+    if not policy_results:
+        raise HTTPException(status_code=404, detail="No relevant policies found in database")
+    
+    # Step 2: Analyze conflicts
+    audit_results = agent2.analyze(policy_results, regulation_text)
+    
+    if not audit_results:
+        raise HTTPException(status_code=500, detail="Analysis failed - no results from compliance auditor")
+    
+    # Step 3: Generate report
+    final_report, report_file = agent3.generate_report(
+        audit_results=audit_results,
+        new_regulation_text=regulation_text,
+        date_of_law=date_of_law,
+        return_path=True
+    )
+    
+    # Only cache complete analyses (no quota/parse fallbacks)
+    if not any(r.get('error_type') for r in audit_results):
+        semantic_cache.add(regulation_text, final_report, report_file,
+                           scope=policy_filter, date_of_law=date_of_law)
+    
+    return final_report
+
+def analyze_with_coalescing(regulation_text: str, date_of_law: Optional[str] = None,
+                            policy_filter: Optional[dict] = None) -> dict:
+    """
+    Run the analysis pipeline, sharing one in-flight run between identical
+    concurrent requests. Duplicates wait for the leader and get its report
+    (or its error).
+    """
+    regulation_id = agent3.generate_regulation_id(regulation_text, date_of_law)
+    flight_key = (regulation_id, repr(policy_filter))
+    report, shared = analysis_flight.do(
+        flight_key, run_analysis_pipeline, regulation_text, date_of_law, policy_filter
+    )
+    if shared:
+        print(f"🔗 Analysis {regulation_id} shared between concurrent identical requests")
+    # Each caller gets its own copy so per-request metadata doesn't leak
+    return dict(report)
+
 @app.get("/")
 def read_root():
     """Health check endpoint"""
@@ -55,6 +138,8 @@ def read_root():
         "endpoints": {
             "analyze_text": "/analyze_regulation (POST - JSON)",
             "analyze_pdf": "/analyze_regulation_pdf (POST - File Upload)",
+            "analyze_amendment": "/analyze_amendment (POST - JSON)",
+            "policy_domains": "/policy_domains (GET)",
             "list_reports": "/reports (GET)"
         }
     }
@@ -67,6 +152,8 @@ def analyze_regulation(request: RegulationRequest):
     **Request Body:**
     - new_regulation_text: The full text of the regulation
     - date_of_law: Optional date when the regulation takes effect (YYYY-MM-DD)
+    - policy_domains: Optional list of policy domains to search (default: all)
+    - tenant: Optional tenant / business unit to search (default: all)
     
     **Returns:**
     - JSON report with identified conflicts and recommendations
@@ -80,24 +167,8 @@ def analyze_regulation(request: RegulationRequest):
         print("🚀 NEW API REQUEST (TEXT) - ARCA Analysis Starting")
         print(f"{'='*60}")
         
-        # Step 1: Find relevant policies
-        policy_results = agent1.analyze(request.new_regulation_text)
-        
-        if not policy_results:
-            raise HTTPException(status_code=404, detail="No relevant policies found in database")
-        
-        # Step 2: Analyze conflicts
-        audit_results = agent2.analyze(policy_results, request.new_regulation_text)
-        
-        if not audit_results:
-            raise HTTPException(status_code=500, detail="Analysis failed - no results from compliance auditor")
-        
-        # Step 3: Generate report
-        final_report = agent3.generate_report(
-            audit_results=audit_results,
-            new_regulation_text=request.new_regulation_text,
-            date_of_law=request.date_of_law
-        )
+        policy_filter = build_policy_filter(request.policy_domains, request.tenant)
+        final_report = analyze_with_coalescing(request.new_regulation_text, request.date_of_law, policy_filter)
         
         print(f"\n✅ API Request Completed Successfully")
         print(f"{'='*60}\n")
@@ -113,7 +184,9 @@ def analyze_regulation(request: RegulationRequest):
 @app.post("/analyze_regulation_pdf")
 async def analyze_regulation_pdf(
     file: UploadFile = File(..., description="PDF file containing the regulation"),
-    date_of_law: Optional[str] = Form(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
+    date_of_law: Optional[str] = Form(None, pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    policy_domains: Optional[str] = Form(None, description="Comma-separated policy domains to search"),
+    tenant: Optional[str] = Form(None, description="Only search policies of this tenant / business unit")
 ):
     """
     Analyze a new regulation against internal policies (PDF UPLOAD)
@@ -121,6 +194,8 @@ async def analyze_regulation_pdf(
     **Upload:**
     - file: PDF file containing the regulation text
     - date_of_law: Optional date when the regulation takes effect (YYYY-MM-DD)
+    - policy_domains: Optional comma-separated policy domains to search
+    - tenant: Optional tenant / business unit to search
     
     **Returns:**
     - JSON report with identified conflicts and recommendations
@@ -150,24 +225,11 @@ async def analyze_regulation_pdf(
         print(f"✅ Extracted {len(regulation_text)} characters from PDF")
         print(f"   Preview: {regulation_text[:100]}...")
         
-        # Step 1: Find relevant policies
-        policy_results = agent1.analyze(regulation_text)
-        
-        if not policy_results:
-            raise HTTPException(status_code=404, detail="No relevant policies found in database")
-        
-        # Step 2: Analyze conflicts
-        audit_results = agent2.analyze(policy_results, regulation_text)
-        
-        if not audit_results:
-            raise HTTPException(status_code=500, detail="Analysis failed - no results from compliance auditor")
-        
-        # Step 3: Generate report
-        final_report = agent3.generate_report(
-            audit_results=audit_results,
-            new_regulation_text=regulation_text,
-            date_of_law=date_of_law
+        # Run in the threadpool so coalesced waiters never block the event loop
+        policy_filter = build_policy_filter(
+            policy_domains.split(',') if policy_domains else None, tenant
         )
+        final_report = await run_in_threadpool(analyze_with_coalescing, regulation_text, date_of_law, policy_filter)
         
         # Add metadata about uploaded file
         final_report["uploaded_file"] = file.filename
@@ -184,6 +246,58 @@ async def analyze_regulation_pdf(
         print(f"❌ Error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/analyze_amendment")
+def analyze_amendment(request: AmendmentRequest):
+    """
+    Re-analyze an amended regulation incrementally
+    
+    Only articles/sections that changed since the previous version go through
+    retrieval and auditing again; verdicts for unchanged sections are reused.
+    
+    **Request Body:**
+    - previous_regulation_id: regulation_id returned for the earlier version
+    - new_regulation_text: The full text of the amended regulation
+    - date_of_law: Optional date when the regulation takes effect (YYYY-MM-DD)
+    
+    **Returns:**
+    - Merged JSON report; each risk is tagged with its section and change_status
+    """
+    try:
+        if not request.new_regulation_text or len(request.new_regulation_text.strip()) < 50:
+            raise HTTPException(status_code=400, detail="Regulation text must be at least 50 characters")
+        
+        print(f"\n{'='*60}")
+        print("🚀 NEW API REQUEST (AMENDMENT) - ARCA Analysis Starting")
+        print(f"   Previous regulation: {request.previous_regulation_id}")
+        print(f"{'='*60}")
+        
+        final_report = amendment_agent.analyze_amendment(
+            previous_regulation_id=request.previous_regulation_id,
+            new_regulation_text=request.new_regulation_text,
+            date_of_law=request.date_of_law
+        )
+        
+        print(f"\n✅ API Request Completed Successfully")
+        print(f"{'='*60}\n")
+        
+        return final_report
+    
+    except HTTPException as e:
+        raise e
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/policy_domains")
+def list_policy_domains():
+    """List the policy domain shards available for filtered searches"""
+    return {
+        "total_shards": len(agent1.shards),
+        "shards": agent1.shards
+    }
+
 @app.get("/reports")
 def list_reports():
     """List all generated compliance reports"""
@@ -204,5 +318,7 @@ if __name__ == "__main__":
     print("\n📋 Available Endpoints:")
     print("   • POST /analyze_regulation - Text input")
     print("   • POST /analyze_regulation_pdf - PDF upload")
+    print("   • POST /analyze_amendment - Incremental re-analysis of an amended regulation")
+    print("   • GET /policy_domains - List policy domain shards")
     print("   • GET /reports - List all reports")
     uvicorn.run(app, host="0.0.0.0", port=8000)
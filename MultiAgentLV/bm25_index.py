@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import re
+
+BM25_FILENAME = "bm25_index.json"
+BM25_STATS_FILENAME = "bm25_stats.json"
+
+# Dropped as unigrams only - bigrams keep them ("of personal", "within 30")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "with"
+}
+
+
+def tokenize(text):
+    """Lowercased word unigrams (minus stopwords) plus adjacent-word bigrams"""
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    terms = [w for w in words if w not in STOPWORDS]
+    terms.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return terms
+
+
+class BM25Index:
+    """
+    Compact BM25 inverted index over the same chunks as a FAISS index
+
+    Documents are identified by their FAISS position, so position i here
+    is vector i in the FAISS index and doc_ids[i] its docstore id.
+    """
+
+    def __init__(self, doc_ids, doc_lengths, postings, k1=1.5, b=0.75):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings  # term -> flat [position, tf, position, tf, ...]
+        self.k1 = k1
+        self.b = b
+        self._apply_stats(len(doc_lengths), sum(doc_lengths), self.document_frequencies())
+
+    def _apply_stats(self, n_docs, total_length, df):
+        self.avg_length = (total_length / n_docs) if n_docs else 0.0
+        self.idf = {}
+        for term, flat in self.postings.items():
+            term_df = df.get(term, len(flat) // 2)
+            self.idf[term] = math.log(1 + (n_docs - term_df + 0.5) / (term_df + 0.5))
+
+    def document_frequencies(self):
+        """Number of chunks containing each term"""
+        return {term: len(flat) // 2 for term, flat in self.postings.items()}
+
+    def use_corpus_stats(self, stats):
+        """Score with corpus-wide IDF and average length instead of this index's own"""
+        self._apply_stats(stats.n_docs, stats.total_length, stats.df)
+
+    @classmethod
+    def build(cls, doc_ids, texts):
+        """Build the index from chunk texts in FAISS order"""
+        postings = {}
+        doc_lengths = []
+        for position, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).extend((position, tf))
+        return cls(list(doc_ids), doc_lengths, postings)
+
+    @classmethod
+    def from_vector_store(cls, vector_store):
+        """Build the index over every chunk of a LangChain FAISS store"""
+        doc_ids = [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+        texts = [vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        return cls.build(doc_ids, texts)
+
+    def save(self, folder):
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings
+        }
+        with open(os.path.join(folder, BM25_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, folder):
+        """Load the index stored next to a FAISS index, or None if absent"""
+        path = os.path.join(folder, BM25_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["doc_ids"], data["doc_lengths"], data["postings"], data["k1"], data["b"])
+
+    def search(self, query, top_k=5):
+        """
+        Score chunks against the query
+
+        Returns:
+            List of (position, bm25_score) sorted by descending score
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            flat = self.postings.get(term)
+            if not flat:
+                continue
+            idf = self.idf[term]
+            for i in range(0, len(flat), 2):
+                position, tf = flat[i], flat[i + 1]
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:top_k]
+
+
+class BM25CorpusStats:
+    """
+    Document frequencies and total length over every chunk of every shard
+
+    A shard covers only one or two policy PDFs, so its own IDF says little:
+    a term found throughout the relevant policy scores near zero there,
+    while a single mention in an unrelated shard scores high. Scoring all
+    shards with these corpus-wide statistics keeps their BM25 scores
+    comparable when the rankings are merged.
+    """
+
+    def __init__(self, n_docs, total_length, df):
+        self.n_docs = n_docs
+        self.total_length = total_length
+        self.df = df
+
+    @classmethod
+    def from_indexes(cls, indexes):
+        """Sum the statistics of the given shard indexes"""
+        n_docs, total_length, df = 0, 0, {}
+        for index in indexes:
+            n_docs += len(index.doc_lengths)
+            total_length += sum(index.doc_lengths)
+            for term, count in index.document_frequencies().items():
+                df[term] = df.get(term, 0) + count
+        return cls(n_docs, total_length, df)
+
+    def save(self, folder):
+        data = {"n_docs": self.n_docs, "total_length": self.total_length, "df": self.df}
+        with open(os.path.join(folder, BM25_STATS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, folder):
+        """Load the statistics stored next to the FAISS shards, or None if absent"""
+        path = os.path.join(folder, BM25_STATS_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["n_docs"], data["total_length"], data["df"])
@@ -0,0 +1,383 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from pypdf import PdfReader
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md')
+MIN_REGULATION_LENGTH = 50
+
+# Sentinel pushed through the queues to shut down the next stage
+_STOP = object()
+
+
+class QuotaExhaustedError(Exception):
+    """Raised when the Gemini quota runs out mid-batch"""
+
+
+def extract_regulation_text(path):
+    """Extract regulation text from a PDF or plain-text file"""
+    if path.lower().endswith('.pdf'):
+        pdf_reader = PdfReader(path)
+        text = ""
+        for page in pdf_reader.pages:
+            text += (page.extract_text() or "") + "\n"
+        return text.strip()
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read().strip()
+
+
+def file_sha256(path):
+    """Hash file contents so edited files are re-analyzed on resume"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CheckpointState:
+    """
+    Local JSON state file recording which regulation files are done.
+    Written atomically after every completed file so a crash or quota
+    exhaustion resumes where it left off.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self.state = {"completed": {}, "failed": {}}
+
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+
+    def is_completed(self, rel_path, file_hash):
+        entry = self.state["completed"].get(rel_path)
+        return entry is not None and entry.get("file_hash") == file_hash
+
+    def mark_completed(self, rel_path, file_hash, regulation_id, report_file):
+        with self._lock:
+            self.state["completed"][rel_path] = {
+                "file_hash": file_hash,
+                "regulation_id": regulation_id,
+                "report_file": report_file,
+                "completed_at": datetime.now().isoformat(timespec="seconds")
+            }
+            self.state["failed"].pop(rel_path, None)
+            self._save()
+
+    def mark_failed(self, rel_path, error):
+        with self._lock:
+            previous = self.state["failed"].get(rel_path, {})
+            self.state["failed"][rel_path] = {
+                "error": str(error)[:300],
+                "attempts": previous.get("attempts", 0) + 1
+            }
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+
+class BulkAnalysisPipeline:
+    """
+    Offline bulk analysis over a directory of regulation files.
+
+    Extraction → Retrieval → Auditing run as pipelined stages connected
+    by bounded queues, each stage with its own pool of worker threads.
+    """
+
+    def __init__(self, researcher, auditor, report_generator, checkpoint,
+                 extract_workers=2, retrieval_workers=1, audit_workers=2,
+                 queue_size=8, top_k=5, date_of_law=None, policy_filter=None):
+        self.researcher = researcher
+        self.auditor = auditor
+        self.report_generator = report_generator
+        self.checkpoint = checkpoint
+        self.top_k = top_k
+        self.date_of_law = date_of_law
+        self.policy_filter = policy_filter
+
+        self.worker_counts = {
+            "extract": extract_workers,
+            "retrieve": retrieval_workers,
+            "audit": audit_workers
+        }
+
+        # Bounded queues give backpressure between stages
+        self.extract_queue = queue.Queue(maxsize=queue_size)
+        self.retrieve_queue = queue.Queue(maxsize=queue_size)
+        self.audit_queue = queue.Queue(maxsize=queue_size)
+
+        self.stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "discovered": 0,
+            "skipped": 0,
+            "completed": 0,
+            "failed": 0,
+            "llm_calls": 0,
+            "stage_seconds": {"extract": 0.0, "retrieve": 0.0, "audit": 0.0}
+        }
+
+    def _record(self, key, amount=1, stage=None):
+        with self._stats_lock:
+            if stage:
+                self.stats["stage_seconds"][stage] += amount
+            else:
+                self.stats[key] += amount
+
+    def _put(self, target_queue, item):
+        """Put with periodic stop checks so producers never block forever"""
+        while not self.stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _interrupt(self):
+        print("\n🛑 Interrupted - finishing in-flight files and saving checkpoint...")
+        self.stop_event.set()
+
+    def _run_stage(self, name, in_queue, out_queue, handler):
+        """Generic worker loop: pull a job, run the handler, pass it on"""
+        while True:
+            job = in_queue.get()
+            if job is _STOP:
+                return
+            if self.stop_event.is_set():
+                continue  # Drain without processing
+
+            start = time.perf_counter()
+            try:
+                result = handler(job)
+            except QuotaExhaustedError:
+                print(f"🛑 Quota exhausted while processing {job['rel_path']} - stopping batch")
+                print(f"   Re-run the same command after the quota resets to resume.")
+                self.stop_event.set()
+                continue
+            except Exception as e:
+                print(f"❌ [{name}] {job['rel_path']}: {e}")
+                self.checkpoint.mark_failed(job['rel_path'], e)
+                self._record("failed")
+                continue
+            finally:
+                self._record(None, time.perf_counter() - start, stage=name)
+
+            if out_queue is not None and result is not None:
+                self._put(out_queue, result)
+
+    def _extract(self, job):
+        text = extract_regulation_text(job['path'])
+        if len(text) < MIN_REGULATION_LENGTH:
+            raise ValueError(f"Extracted text is too short ({len(text)} characters)")
+        job['text'] = text
+        return job
+
+    def _retrieve(self, job):
+        job['policy_results'] = self.researcher.vector_db_search(
+            job['text'], top_k=self.top_k, policy_filter=self.policy_filter
+        )
+        if not job['policy_results']:
+            raise ValueError("No relevant policies found in database")
+        return job
+
+    def _audit(self, job):
+        audit_results = self.auditor.analyze(job['policy_results'], job['text'])
+        self._record("llm_calls", len(job['policy_results']))
+
+        # Don't checkpoint partial results - the file is retried on resume
+        if any(r.get('error_type') == 'quota_exceeded' for r in audit_results):
+            raise QuotaExhaustedError(job['rel_path'])
+        if not audit_results:
+            raise ValueError("Analysis failed - no results from compliance auditor")
+
+        report = self.report_generator.build_report(
+            audit_results=audit_results,
+            new_regulation_text=job['text'],
+            date_of_law=self.date_of_law
+        )
+        report["source_file"] = job['rel_path']
+        filepath = self.report_generator.save_report(report, job['text'], audit_results)
+
+        self.checkpoint.mark_completed(
+            job['rel_path'], job['file_hash'], report['regulation_id'], os.path.basename(filepath)
+        )
+        self._record("completed")
+        print(f"✅ {job['rel_path']} → {os.path.basename(filepath)}")
+        return None
+
+    def discover(self, input_dir):
+        """List regulation files under input_dir in a stable order"""
+        paths = []
+        for root, _, files in os.walk(input_dir):
+            for name in files:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        paths.sort()
+        return paths
+
+    def run(self, input_dir):
+        """Stream every regulation file in input_dir through the pipeline"""
+        start = time.perf_counter()
+
+        stages = [
+            ("extract", self.extract_queue, self.retrieve_queue, self._extract),
+            ("retrieve", self.retrieve_queue, self.audit_queue, self._retrieve),
+            ("audit", self.audit_queue, None, self._audit),
+        ]
+
+        stage_threads = []
+        for name, in_queue, out_queue, handler in stages:
+            threads = [
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(name, in_queue, out_queue, handler),
+                    name=f"{name}-{i}",
+                    daemon=True
+                )
+                for i in range(self.worker_counts[name])
+            ]
+            for t in threads:
+                t.start()
+            stage_threads.append(threads)
+
+        # Producer: feed pending files into the first stage
+        try:
+            for path in self.discover(input_dir):
+                rel_path = os.path.relpath(path, input_dir).replace('\\', '/')
+                file_hash = file_sha256(path)
+                self._record("discovered")
+
+                if self.checkpoint.is_completed(rel_path, file_hash):
+                    self._record("skipped")
+                    continue
+
+                job = {"path": path, "rel_path": rel_path, "file_hash": file_hash}
+                if not self._put(self.extract_queue, job):
+                    break
+        except KeyboardInterrupt:
+            self._interrupt()
+
+        # Shut stages down in order: one sentinel per worker, queued behind
+        # any remaining jobs so in-flight files finish first. Most of the wall
+        # time is spent here, so Ctrl-C is handled the same way; a second
+        # Ctrl-C stops waiting for in-flight files.
+        stage_queues = [self.extract_queue, self.retrieve_queue, self.audit_queue]
+        sentinels_sent = [0] * len(stage_queues)
+        while True:
+            try:
+                for i, (stage_queue, threads) in enumerate(zip(stage_queues, stage_threads)):
+                    while sentinels_sent[i] < len(threads):
+                        stage_queue.put(_STOP)
+                        sentinels_sent[i] += 1
+                    for t in threads:
+                        t.join()
+                break
+            except KeyboardInterrupt:
+                if self.stop_event.is_set():
+                    print("\n🛑 Interrupted again - not waiting for in-flight files")
+                    break
+                self._interrupt()
+
+        self.stats["elapsed_seconds"] = time.perf_counter() - start
+        self.stats["interrupted"] = self.stop_event.is_set()
+        return self.stats
+
+
+def print_throughput_summary(stats):
+    """Print end-of-run throughput summary"""
+    elapsed = stats["elapsed_seconds"]
+    processed = stats["completed"] + stats["failed"]
+
+    print("\n" + "="*60)
+    print("📊 BULK ANALYSIS SUMMARY")
+    print("="*60)
+    print(f"   Files discovered:       {stats['discovered']}")
+    print(f"   Skipped (checkpointed): {stats['skipped']}")
+    print(f"   Completed:              {stats['completed']}")
+    print(f"   Failed:                 {stats['failed']}")
+    print(f"   Gemini calls:           {stats['llm_calls']}")
+    print(f"   Elapsed:                {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"   Throughput:             {stats['completed'] / elapsed * 60:.2f} regulations/min")
+    if processed:
+        print("   Avg time per file by stage:")
+        for stage, seconds in stats["stage_seconds"].items():
+            print(f"     • {stage:<9} {seconds / processed:.2f}s")
+    if stats["interrupted"]:
+        print("\n⚠️  Run stopped early - re-run the same command to resume.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="ARCA bulk analysis - run the compliance pipeline over a directory of regulations"
+    )
+    parser.add_argument("input_dir", help="Directory of regulation files (.pdf, .txt, .md)")
+    parser.add_argument("--output", default="../output", help="Report output folder (default: ../output)")
+    parser.add_argument("--faiss-index", default="faiss_index", help="FAISS index path (default: faiss_index)")
+    parser.add_argument("--state-file", default="bulk_analysis_state.json",
+                        help="Checkpoint file used to resume interrupted runs")
+    parser.add_argument("--date-of-law", default=None, help="Optional date applied to every report (YYYY-MM-DD)")
+    parser.add_argument("--top-k", type=int, default=5, help="Policy excerpts audited per regulation")
+    parser.add_argument("--policy-domains", default=None,
+                        help="Comma-separated policy domains to search (default: all)")
+    parser.add_argument("--extract-workers", type=int, default=2)
+    parser.add_argument("--retrieval-workers", type=int, default=1)
+    parser.add_argument("--audit-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8, help="Max jobs buffered between stages")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from agent_policy_researcher import PolicyResearcherAgent, UnknownPolicyDomainError, normalize_policy_filter
+    from agent_compliance_auditor import ComplianceAuditorAgent
+    from agent_report_generator import ReportGeneratorAgent
+
+    args = parse_args(argv)
+    if not os.path.isdir(args.input_dir):
+        print(f"❌ Input directory not found: {args.input_dir}")
+        return 1
+
+    print("🚀 Initializing ARCA Bulk Analysis...")
+    researcher = PolicyResearcherAgent(args.faiss_index)
+    policy_filter = normalize_policy_filter(args.policy_domains.split(',') if args.policy_domains else None)
+    try:
+        researcher.select_shards(policy_filter)
+    except UnknownPolicyDomainError as e:
+        print(f"❌ {e}")
+        return 1
+
+    pipeline = BulkAnalysisPipeline(
+        researcher=researcher,
+        auditor=ComplianceAuditorAgent(),
+        report_generator=ReportGeneratorAgent(args.output),
+        checkpoint=CheckpointState(args.state_file),
+        extract_workers=args.extract_workers,
+        retrieval_workers=args.retrieval_workers,
+        audit_workers=args.audit_workers,
+        queue_size=args.queue_size,
+        top_k=args.top_k,
+        date_of_law=args.date_of_law,
+        policy_filter=policy_filter
+    )
+
+    stats = pipeline.run(args.input_dir)
+    print_throughput_summary(stats)
+    return 0 if not stats["interrupted"] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
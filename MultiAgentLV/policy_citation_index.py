@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def chunk_content_hash(content):
+    """Stable hash of a policy chunk's text"""
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def chunk_key(source, page, content):
+    """Identify a policy chunk by source file, page and content hash"""
+    return f"{source}|{page}|{chunk_content_hash(content)}"
+
+
+class PolicyCitationIndex:
+    """
+    Reverse index from policy chunk (source/page/content hash) to the
+    reports and verdicts that cited it. Kept up to date as regulation
+    records are saved, so a revised policy PDF maps straight to the
+    reports that need re-auditing.
+
+    Stored as one small file per regulation, written atomically, so the API
+    server, bulk_analyze.py and reaudit_policies.py can update it
+    concurrently without overwriting each other's entries.
+    """
+
+    def __init__(self, index_folder):
+        self.index_folder = index_folder
+
+    def exists(self):
+        return os.path.isdir(self.index_folder)
+
+    def _citations_path(self, regulation_id):
+        return os.path.join(self.index_folder, f"{regulation_id}.json")
+
+    def _write_record(self, record):
+        citations = []
+        for verdict in record['audit_results']:
+            excerpt = verdict.get('policy_excerpt')
+            if excerpt is None:
+                continue  # Verdicts saved before full excerpts were recorded
+            citations.append({
+                "chunk_key": chunk_key(verdict['source'], verdict['page'], excerpt),
+                "source": verdict['source'],
+                "page": verdict['page'],
+                "content_hash": chunk_content_hash(excerpt),
+                "regulation_id": record['regulation_id'],
+                "report_file": record['report_file'],
+                "policy_id": verdict['policy_id']
+            })
+
+        os.makedirs(self.index_folder, exist_ok=True)
+        path = self._citations_path(record['regulation_id'])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(citations, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def update_record(self, record):
+        """Replace all citations of a regulation with those in its record"""
+        self._write_record(record)
+
+    def rebuild_from_records(self, records_folder):
+        """Rebuild the whole index from stored regulation records"""
+        os.makedirs(self.index_folder, exist_ok=True)
+        for name in sorted(os.listdir(records_folder)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(records_folder, name), "r", encoding="utf-8") as f:
+                self._write_record(json.load(f))
+
+    def load_chunks(self):
+        """
+        Read the current index from disk
+
+        Returns:
+            Dict of chunk_key → {source, page, content_hash, citations}
+        """
+        chunks = {}
+        if not self.exists():
+            return chunks
+        for name in sorted(os.listdir(self.index_folder)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.index_folder, name), "r", encoding="utf-8") as f:
+                    citations = json.load(f)
+            except FileNotFoundError:
+                continue  # Replaced while listing
+            for citation in citations:
+                entry = chunks.setdefault(citation['chunk_key'], {
+                    "source": citation['source'],
+                    "page": citation['page'],
+                    "content_hash": citation['content_hash'],
+                    "citations": []
+                })
+                entry['citations'].append({
+                    "regulation_id": citation['regulation_id'],
+                    "report_file": citation['report_file'],
+                    "policy_id": citation['policy_id']
+                })
+        return chunks
+
+    def stale_chunks(self, current_keys):
+        """
+        Find indexed chunks that no longer exist in the policy database
+
+        Args:
+            current_keys: Set of chunk_key values for the re-indexed policies
+
+        Returns:
+            Dict of chunk_key → index entry for chunks that changed or disappeared
+        """
+        return {key: entry for key, entry in self.load_chunks().items() if key not in current_keys}
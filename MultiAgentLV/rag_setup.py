@@ -3,13 +3,57 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings  # ✅ Updated
 from langchain_community.vectorstores import FAISS
 import os
+import re
+import json
+from bm25_index import BM25Index, BM25CorpusStats
+
+# Policy domain keywords matched against the PDF file name (first match wins)
+POLICY_DOMAINS = [
+    ("retention", "retention"),
+    ("classification", "classification"),
+    ("access_control", "access_control"),
+    ("backup", "backup"),
+    ("incident", "incident_response"),
+    ("onboarding", "onboarding"),
+    ("change_management", "change_management"),
+    ("audit", "audit"),
+    ("secure_coding", "secure_development"),
+    ("vendor", "vendor"),
+    ("privacy", "privacy"),
+    ("governance", "governance"),
+]
 
 # 1. Load PDF files
 def load_documents(pdf_folder_path):
     loader = DirectoryLoader(pdf_folder_path, glob="**/*.pdf", loader_cls=PyPDFLoader)
     documents = loader.load()
+    tag_documents(documents, pdf_folder_path)
     return documents
 
+# 1b. Tag each document with its policy domain and tenant
+def policy_domain(source_path):
+    name = os.path.splitext(os.path.basename(source_path))[0].lower()
+    for keyword, domain in POLICY_DOMAINS:
+        if keyword in name:
+            return domain
+    # Fallback: file name without numeric/tenant prefix
+    return re.sub(r'^\d+_([a-z]+_)?', '', name)
+
+def policy_tenant(source_path, pdf_folder_path):
+    # Sub-folders of the policy folder are tenants / business units
+    rel_path = os.path.relpath(source_path, pdf_folder_path).replace('\\', '/')
+    if '/' in rel_path:
+        return rel_path.split('/', 1)[0]
+    # Otherwise use the file name prefix, e.g. 01_MA_... → MA
+    match = re.match(r'^\d+_([A-Za-z]+)_', os.path.basename(source_path))
+    return match.group(1) if match else "default"
+
+def tag_documents(documents, pdf_folder_path):
+    for doc in documents:
+        source = doc.metadata.get('source', '')
+        doc.metadata['domain'] = policy_domain(source)
+        doc.metadata['tenant'] = policy_tenant(source, pdf_folder_path)
+
 # 2. Split documents into chunks
 def split_documents(documents):
     text_splitter = RecursiveCharacterTextSplitter(
@@ -20,19 +64,53 @@ def split_documents(documents):
     chunks = text_splitter.split_documents(documents)
     return chunks
 
-# 3. Create FAISS vector store
-def create_vector_store(chunks, save_path="faiss_index"):
+# 3. Remove the single full index left by older versions of this script
+def remove_legacy_index(save_path="faiss_index"):
+    for name in ("index.faiss", "index.pkl", "bm25_index.json"):
+        path = os.path.join(save_path, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+# 4. Create one FAISS index per (tenant, domain) shard plus a manifest.
+#    The shards are the only store, so each chunk is embedded exactly once.
+def create_shards(chunks, save_path="faiss_index"):
     embeddings = HuggingFaceEmbeddings(
         model_name="sentence-transformers/all-MiniLM-L6-v2"
     )
-    vector_store = FAISS.from_documents(chunks, embeddings)
-    vector_store.save_local(save_path)
-    return vector_store
+    groups = {}
+    for chunk in chunks:
+        shard_id = f"{chunk.metadata['tenant']}__{chunk.metadata['domain']}"
+        groups.setdefault(shard_id, []).append(chunk)
+
+    manifest = {"shards": {}}
+    bm25_indexes = []
+    for shard_id, shard_chunks in sorted(groups.items()):
+        shard_path = os.path.join(save_path, "shards", shard_id)
+        shard_store = FAISS.from_documents(shard_chunks, embeddings)
+        shard_store.save_local(shard_path)
+        # Lexical index over the same chunks, stored next to the FAISS files
+        bm25 = BM25Index.from_vector_store(shard_store)
+        bm25.save(shard_path)
+        bm25_indexes.append(bm25)
+        manifest["shards"][shard_id] = {
+            "tenant": shard_chunks[0].metadata['tenant'],
+            "domain": shard_chunks[0].metadata['domain'],
+            "sources": sorted({os.path.basename(c.metadata['source']) for c in shard_chunks}),
+            "chunks": len(shard_chunks),
+            "path": f"shards/{shard_id}"
+        }
+
+    with open(os.path.join(save_path, "shards", "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    # Corpus-wide BM25 statistics, so scores from different shards compare
+    BM25CorpusStats.from_indexes(bm25_indexes).save(save_path)
+    return manifest
 
 # Run the pipeline
 if __name__ == "__main__":
     docs = load_documents("./policies")  # Put your PDFs here
     chunks = split_documents(docs)
     print(f"Created {len(chunks)} chunks")
-    vector_store = create_vector_store(chunks)
-    print("FAISS index created and saved!")
+    manifest = create_shards(chunks)
+    remove_legacy_index()
+    print(f"Created {len(manifest['shards'])} policy domain shards (FAISS + BM25) and saved!")
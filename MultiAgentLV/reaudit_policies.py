@@ -0,0 +1,177 @@
+import argparse
+import difflib
+import json
+import os
+from datetime import datetime
+
+from agent_amendment_analyzer import split_into_sections
+from policy_citation_index import chunk_key
+
+
+def find_replacement_chunk(old_entry, old_excerpt, chunks_by_source):
+    """
+    Pick the re-indexed chunk that best replaces a stale one
+
+    Prefers chunks on the same page of the same policy file, then anywhere
+    in that file. Returns None when the policy file no longer exists.
+    """
+    candidates = chunks_by_source.get(old_entry['source'], [])
+    same_page = [c for c in candidates if c['page'] == old_entry['page']]
+    candidates = same_page or candidates
+    if not candidates:
+        return None
+
+    return max(
+        candidates,
+        key=lambda c: difflib.SequenceMatcher(None, old_excerpt, c['excerpt']).ratio()
+    )
+
+
+class PolicyReauditor:
+    """
+    Re-audits only the (policy excerpt, regulation) pairs affected by a
+    policy change, using the reverse citation index kept by the report generator
+    """
+
+    def __init__(self, researcher, auditor, report_generator):
+        self.researcher = researcher
+        self.auditor = auditor
+        self.report_generator = report_generator
+
+        # Chunks in the (re-indexed) FAISS database
+        self.chunks_by_source = {}
+        self.current_keys = set()
+        for chunk in researcher.iter_chunks():
+            self.chunks_by_source.setdefault(chunk['source'], []).append(chunk)
+            self.current_keys.add(chunk_key(chunk['source'], chunk['page'], chunk['excerpt']))
+
+    def affected_regulations(self):
+        """Map regulation_id → set of stale chunk keys it cited"""
+        stale = self.report_generator.citation_index.stale_chunks(self.current_keys)
+        affected = {}
+        for key, entry in stale.items():
+            for citation in entry['citations']:
+                affected.setdefault(citation['regulation_id'], set()).add(key)
+        return affected
+
+    def reaudit_regulation(self, regulation_id, stale_keys):
+        """
+        Re-audit the stale verdicts of one regulation and update its report
+
+        Returns:
+            Number of Gemini calls made, or None if the quota ran out
+            (the report is then left untouched so a later run retries it)
+        """
+        record = self.report_generator.load_regulation_record(regulation_id)
+        sections = {s['key']: s['text'] for s in split_into_sections(record['regulation_text'])}
+
+        updated = []
+        reaudited = 0
+        dropped = 0
+        for verdict in record['audit_results']:
+            excerpt = verdict.get('policy_excerpt')
+            if excerpt is None or chunk_key(verdict['source'], verdict['page'], excerpt) not in stale_keys:
+                updated.append(verdict)
+                continue
+
+            replacement = find_replacement_chunk(verdict, excerpt, self.chunks_by_source)
+            if replacement is None:
+                print(f"   🗑️  {verdict['policy_id']}: {verdict['source']} no longer exists - verdict removed")
+                dropped += 1
+                continue
+
+            # Amendment verdicts were audited against their section only
+            regulation_text = sections.get(verdict.get('section'), record['regulation_text'])
+            analysis = self.auditor.analyze_single_policy(
+                policy_excerpt=replacement['excerpt'],
+                new_regulation_text=regulation_text,
+                policy_id=verdict['policy_id']
+            )
+            reaudited += 1
+            if analysis.get('error_type') == 'quota_exceeded':
+                return None
+
+            analysis['source'] = replacement['source']
+            analysis['page'] = replacement['page']
+            analysis['policy_excerpt'] = replacement['excerpt']
+            for field in ('section', 'change_status'):
+                if field in verdict:
+                    analysis[field] = verdict[field]
+            print(f"   🔄 {verdict['policy_id']}: {verdict['severity']} → {analysis['severity']}")
+            updated.append(analysis)
+
+        # Same ordering as a full analysis, with fresh sequential policy IDs
+        severity_order = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
+        updated.sort(key=lambda x: severity_order.get(x['severity'], 3))
+        for i, verdict in enumerate(updated, 1):
+            verdict['policy_id'] = f"POL-{str(i).zfill(3)}"
+
+        # Refresh the existing report in place, keeping its other metadata
+        rebuilt = self.report_generator.build_report(updated, record['regulation_text'])
+        report_path = os.path.join(self.report_generator.output_folder, record['report_file'])
+        if os.path.exists(report_path):
+            with open(report_path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        else:
+            report = dict(rebuilt, regulation_id=regulation_id, date_of_law=record['date_of_law'])
+
+        for field in ('total_risks_flagged', 'risk_breakdown', 'risks', 'recommendation'):
+            report[field] = rebuilt[field]
+        report["policy_reaudit"] = {
+            "date_reaudited": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "verdicts_reaudited": reaudited,
+            "verdicts_removed": dropped,
+            "policy_sources": sorted({k.split('|', 1)[0] for k in stale_keys})
+        }
+
+        self.report_generator.save_report(
+            report, record['regulation_text'], updated, report_file=record['report_file']
+        )
+        return reaudited
+
+    def run(self, dry_run=False):
+        """Re-audit every report affected by changed policy chunks"""
+        affected = self.affected_regulations()
+        print(f"\n📋 {len(affected)} report(s) cite changed policy excerpts")
+
+        total_calls = 0
+        updated_reports = 0
+        for regulation_id, stale_keys in sorted(affected.items()):
+            sources = sorted({k.split('|', 1)[0] for k in stale_keys})
+            print(f"\n🔍 {regulation_id}: {len(stale_keys)} stale excerpt(s) from {', '.join(sources)}")
+            if dry_run:
+                continue
+
+            calls = self.reaudit_regulation(regulation_id, stale_keys)
+            if calls is None:
+                print("🛑 Gemini quota exhausted - re-run after the quota resets to finish")
+                break
+            total_calls += calls
+            updated_reports += 1
+
+        print(f"\n✅ Updated {updated_reports} report(s) with {total_calls} Gemini call(s)")
+        return updated_reports
+
+
+def main(argv=None):
+    from agent_policy_researcher import PolicyResearcherAgent
+    from agent_compliance_auditor import ComplianceAuditorAgent
+    from agent_report_generator import ReportGeneratorAgent
+
+    parser = argparse.ArgumentParser(
+        description="Re-audit past reports that cited policy excerpts changed since the last rag_setup.py run"
+    )
+    parser.add_argument("--output", default="../output", help="Report output folder (default: ../output)")
+    parser.add_argument("--faiss-index", default="faiss_index", help="FAISS index path (default: faiss_index)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list affected reports")
+    args = parser.parse_args(argv)
+
+    researcher = PolicyResearcherAgent(args.faiss_index)
+    auditor = None if args.dry_run else ComplianceAuditorAgent()
+    reauditor = PolicyReauditor(researcher, auditor, ReportGeneratorAgent(args.output))
+    reauditor.run(dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from agent_policy_researcher import get_embedding_model
+from agent_amendment_analyzer import SECTION_HEADING_RE, HEADING_KINDS
+
+# Characters per embedding window (MiniLM truncates long inputs, so the
+# regulation is embedded in windows and mean-pooled)
+EMBEDDING_WINDOW_CHARS = 1000
+
+# Runs of single letters ("A l l i n t e r n a l"); digits are left alone so
+# "1 2 3 4" is not merged into one number
+_LETTER_SPACED_RE = re.compile(r'\b(?:[^\W\d_] ){3,}[^\W\d_]\b')
+# Explicit page markers only ("Page 2", "Page 2 of 5", "2 of 5", "- 2 -");
+# bare numbers on their own line are often content ("within\n30\ndays")
+_PAGE_MARKER_RE = re.compile(
+    r'^[ \t]*(?:page[ \t]+\d+(?:[ \t]+of[ \t]+\d+)?|\d+[ \t]+of[ \t]+\d+|-[ \t]*\d+[ \t]*-)[ \t]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)*')
+
+
+def normalize_regulation_text(text):
+    """
+    Normalize extracted regulation text so PDF noise doesn't defeat matching
+
+    - Unicode normalization (ligatures, non-breaking spaces, smart quotes)
+    - Page marker lines ("Page 2 of 5") removed, hyphenated line breaks re-joined
+    - Letter-spaced runs ("A l l i n t e r n a l") collapsed
+    - Lowercased with whitespace collapsed
+    """
+    text = unicodedata.normalize('NFKC', text)
+    text = text.replace('’', "'").replace('“', '"').replace('”', '"')
+    text = _PAGE_MARKER_RE.sub('', text)
+    text = re.sub(r'(\w)-\s*\n\s*(\w)', r'\1\2', text)
+    text = _LETTER_SPACED_RE.sub(lambda m: m.group(0).replace(' ', ''), text)
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def exact_terms(regulation_text):
+    """
+    Numbers and article/section headings of a regulation
+
+    Mean-pooled embeddings barely move when "12 months" becomes "6 months",
+    so a cached report is only reused when these match exactly.
+    """
+    text = unicodedata.normalize('NFKC', regulation_text)
+    headings = {
+        f"{HEADING_KINDS[m.group(1).lower()]} {m.group(2).lower()}"
+        for m in SECTION_HEADING_RE.finditer(text)
+    }
+    numbers = set(_NUMBER_RE.findall(normalize_regulation_text(regulation_text)))
+    return {"numbers": sorted(numbers), "headings": sorted(headings)}
+
+
+@contextmanager
+def _exclusive_lock_file(lock_path, timeout=10.0, stale_after=60.0):
+    """
+    Cross-process lock held by creating lock_path exclusively
+
+    A lock file older than stale_after seconds is left from a crashed
+    process and is removed. Raises TimeoutError if not acquired in time.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def _replace_atomically(path, write):
+    """Write a file through a temp file and os.replace, so readers never see it torn"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class SemanticReportCache:
+    """
+    Near-duplicate result cache for regulations
+
+    Stores a normalized embedding per analyzed regulation in a small FAISS
+    inner-product index. A new submission whose cosine similarity to a past
+    regulation reaches the threshold, and whose numbers and headings are the
+    same (see exact_terms), gets that regulation's report back.
+
+    Several API workers share the cache folder: each reloads the files when
+    another process has changed them, and additions are made under a lock
+    file with both files replaced atomically (index first, entries last).
+    """
+
+    def __init__(self, report_generator, threshold=0.97):
+        self.report_generator = report_generator
+        self.threshold = threshold
+        self.cache_folder = os.path.join(report_generator.output_folder, "semantic_cache")
+        self.index_path = os.path.join(self.cache_folder, "index.faiss")
+        self.entries_path = os.path.join(self.cache_folder, "entries.json")
+        self.lock_path = os.path.join(self.cache_folder, "cache.lock")
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_folder, exist_ok=True)
+        self.index = None
+        self.entries = []
+        self._loaded_version = None
+        self._reload_if_changed()
+
+        print(f"✅ Semantic cache loaded ({len(self.entries)} regulations, threshold={threshold})")
+
+    def _reload_if_changed(self):
+        """Re-read the cache files if another process replaced them (caller holds _lock)"""
+        try:
+            stat = os.stat(self.entries_path)
+        except FileNotFoundError:
+            return
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._loaded_version or not os.path.exists(self.index_path):
+            return
+        # Entries are written last, so the index read here has at least as
+        # many vectors as there are entries; ids past the end are skipped
+        self.index = faiss.read_index(self.index_path)
+        with open(self.entries_path, "r", encoding="utf-8") as f:
+            self.entries = json.load(f)
+        self._loaded_version = version
+
+    def embed(self, regulation_text):
+        """Embed normalized regulation text as one unit-length vector"""
+        words = normalize_regulation_text(regulation_text).split(' ')
+        windows, current = [], ""
+        for word in words:
+            if current and len(current) + len(word) + 1 > EMBEDDING_WINDOW_CHARS:
+                windows.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        windows.append(current)
+
+        vectors = np.array(get_embedding_model().embed_documents(windows), dtype='float32')
+        vector = vectors.mean(axis=0)
+        vector /= max(np.linalg.norm(vector), 1e-12)
+        return vector.reshape(1, -1)
+
+    def lookup(self, regulation_text, scope=None, date_of_law=None):
+        """
+        Find a cached report for a near-identical regulation
+
+        Args:
+            regulation_text: The regulation text
+            scope: Normalized policy filter the analysis ran with (None = all policies)
+            date_of_law: Optional date string; must match the cached analysis
+
+        Returns:
+            Copy of the cached report annotated with 'semantic_cache'
+            (matched_regulation_id, similarity), or None on a miss
+        """
+        if self.threshold > 1.0:
+            return None
+
+        vector = self.embed(regulation_text)
+        terms = exact_terms(regulation_text)
+        with self._lock:
+            self._reload_if_changed()
+            if self.index is None or self.index.ntotal == 0:
+                return None
+            scores, ids = self.index.search(vector, min(self.index.ntotal, 10))
+            entries = self.entries
+
+        # Best match analyzed with the same policy scope and date of law, and
+        # with the same numbers and headings (a one-number amendment is not a duplicate)
+        match = None
+        for score, idx in zip(scores[0], ids[0]):
+            if idx < 0 or score < self.threshold:
+                break
+            if idx >= len(entries):
+                continue  # Vector added by another process whose entry isn't written yet
+            entry = entries[idx]
+            if (entry.get('scope') == scope and entry.get('date_of_law') == date_of_law
+                    and entry.get('exact_terms') == terms):
+                match = (entry, float(score))
+                break
+        if match is None:
+            return None
+
+        entry, similarity = match
+        regulation_id = entry['regulation_id']
+        try:
+            # The entry's own report file: regulation records are shared by
+            # every scope, so they may point at another scope's report
+            report_path = os.path.join(self.report_generator.output_folder, entry['report_file'])
+            with open(report_path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (KeyError, FileNotFoundError, json.JSONDecodeError):
+            return None  # Report deleted (or entry from before report_file) - treat as a miss
+
+        print(f"♻️  Semantic cache hit: {regulation_id} (similarity {similarity:.4f})")
+        report["semantic_cache"] = {
+            "matched_regulation_id": regulation_id,
+            "similarity": round(similarity, 4)
+        }
+        return report
+
+    def add(self, regulation_text, report, report_file, scope=None, date_of_law=None):
+        """
+        Add an analyzed regulation to the cache
+
+        Args:
+            regulation_text: The regulation text
+            report: Report dict of the analysis
+            report_file: File name of the saved report in the output folder
+            scope: Normalized policy filter the analysis ran with
+            date_of_law: Optional date string the analysis ran with
+        """
+        if self.threshold > 1.0:
+            return
+
+        vector = self.embed(regulation_text)
+        terms = exact_terms(regulation_text)
+        with self._lock:
+            try:
+                with _exclusive_lock_file(self.lock_path):
+                    # Merge what other processes added since our last read
+                    self._reload_if_changed()
+                    if self.index is not None and self.index.ntotal > len(self.entries):
+                        # Torn write from a crashed process: drop vectors without entries
+                        self.index.remove_ids(np.arange(len(self.entries), self.index.ntotal, dtype='int64'))
+                    if any(e['regulation_id'] == report['regulation_id'] and e.get('scope') == scope
+                           and e.get('date_of_law') == date_of_law for e in self.entries):
+                        return
+                    if self.index is None:
+                        self.index = faiss.IndexFlatIP(vector.shape[1])
+                    self.index.add(vector)
+                    self.entries = self.entries + [{
+                        "regulation_id": report['regulation_id'],
+                        "report_file": report_file,
+                        "scope": scope,
+                        "date_of_law": date_of_law,
+                        "exact_terms": terms
+                    }]
+
+                    _replace_atomically(self.index_path, lambda path: faiss.write_index(self.index, path))
+                    _replace_atomically(self.entries_path, self._write_entries)
+                    stat = os.stat(self.entries_path)
+                    self._loaded_version = (stat.st_mtime_ns, stat.st_size)
+            except TimeoutError as e:
+                print(f"⚠️  Semantic cache not updated: {e}")
+
+    def _write_entries(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
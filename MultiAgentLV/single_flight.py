@@ -0,0 +1,69 @@
+import threading
+
+
+class _InFlightCall:
+    """State shared between the leader call and its waiting duplicates"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.duplicates = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight block until it finishes and receive the same
+    result, or the same exception if it failed. Nothing is cached once the
+    call completes - the next caller for that key starts a fresh run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) once per in-flight key
+
+        Returns:
+            (result, shared) where shared is True if the result was
+            delivered to more than one caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.duplicates += 1
+                is_leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                is_leader = True
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            # Includes cancellation (KeyboardInterrupt/SystemExit): waiters
+            # must not hang, and the key is released so a retry runs again
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, call.duplicates > 0
+
+    def in_flight(self):
+        """Number of distinct keys currently being computed"""
+        with self._lock:
+            return len(self._calls)